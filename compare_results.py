@@ -2,48 +2,35 @@ import json
 import numpy as np
 from scipy import stats
 
+def parse_int_array(line):
+    """Parse the bracketed, comma-separated integer list in a result line"""
+    start = line.find('[') + 1
+    end = line.find(']')
+    return np.fromstring(line[start:end], sep=',', dtype=np.int64)
+
 def parse_cpp_results(filename):
     """Parse C++ results from text file"""
     results = []
+    result = None
     
+    # Walk the file line by line, each 'Test Case: ' line starts a new result
     with open(filename, 'r') as f:
-        content = f.read()
-    
-    # Split by test cases
-    test_sections = content.split('Test Case: ')[1:]  # Skip header
-    
-    for section in test_sections:
-        lines = section.strip().split('\n')
-        test_name = lines[0]
-        
-        # Parse parameters and results
-        result = {"test_case": test_name}
-        
-        for line in lines:
-            if line.startswith('First 100 samples:'):
-                # Extract samples array
-                start = line.find('[') + 1
-                end = line.find(']')
-                samples_str = line[start:end]
-                if samples_str.strip():
-                    result['samples'] = [int(x.strip()) for x in samples_str.split(',')]
-                else:
-                    result['samples'] = []
+        for line in f:
+            if line.startswith('Test Case: '):
+                result = {"test_case": line[len('Test Case: '):].strip()}
+                results.append(result)
+            
+            elif result is None:
+                continue  # Skip header
+            
+            elif line.startswith('First 100 samples:'):
+                result['samples'] = parse_int_array(line)
             
             elif line.startswith('Distribution:'):
-                # Extract distribution array
-                start = line.find('[') + 1
-                end = line.find(']')
-                dist_str = line[start:end]
-                if dist_str.strip():
-                    result['distribution'] = [int(x.strip()) for x in dist_str.split(',')]
-                else:
-                    result['distribution'] = []
+                result['distribution'] = parse_int_array(line)
             
             elif line.startswith('Total samples:'):
                 result['total_samples'] = int(line.split(':')[1].strip())
-        
-        results.append(result)
     
     return results
 
@@ -60,11 +47,17 @@ def compare_distributions(py_dist, cpp_dist, test_name):
     
     # Chi-square test for distribution similarity
     # Only test tokens that were sampled in either implementation
-    mask = (py_dist > 0) | (cpp_dist > 0)
-    if not np.any(mask):
+    mask = np.add(py_dist, cpp_dist) > 0
+    if not mask.any():
         print(f"⚠️  {test_name}: No samples in either distribution")
         return True
     
+    total_py = py_dist.sum(where=mask)
+    total_cpp = cpp_dist.sum(where=mask)
+    if total_py == 0 or total_cpp == 0:
+        print(f"❌ {test_name}: Empty distributions")
+        return False
+    
     py_masked = py_dist[mask]
     cpp_masked = cpp_dist[mask]
     
@@ -73,34 +66,33 @@ def compare_distributions(py_dist, cpp_dist, test_name):
     cpp_masked = cpp_masked + 1
     
     try:
-        # Chi-square test
-        statistic, p_value = stats.chisquare(cpp_masked, py_masked)
+        # Chi-square test, statistic computed inline and only the p-value from scipy
+        # Expected counts are scaled to the C++ total, which can be short if its loop broke early
+        expected = py_masked * (cpp_masked.sum() / py_masked.sum())
+        diff = cpp_masked - expected
+        statistic = float(np.sum(diff * diff / expected))
+        df = py_masked.size - 1
+        # A single sampled token leaves no degrees of freedom, both sides put all mass on it
+        p_value = float(stats.chi2.sf(statistic, df=df)) if df > 0 else 1.0
         
         # Compute relative differences for major tokens
-        total_py = np.sum(py_dist)
-        total_cpp = np.sum(cpp_dist)
+        py_probs = py_dist / total_py
+        cpp_probs = cpp_dist / total_cpp
         
-        if total_py > 0 and total_cpp > 0:
-            py_probs = py_dist / total_py
-            cpp_probs = cpp_dist / total_cpp
+        # Check if major tokens (>5% probability) are reasonably close
+        major_tokens = (py_probs > 0.05) | (cpp_probs > 0.05)
+        if np.any(major_tokens):
+            max_diff = float(np.max(np.abs(py_probs - cpp_probs), where=major_tokens, initial=0.0))
             
-            # Check if major tokens (>5% probability) are reasonably close
-            major_tokens = (py_probs > 0.05) | (cpp_probs > 0.05)
-            if np.any(major_tokens):
-                max_diff = np.max(np.abs(py_probs[major_tokens] - cpp_probs[major_tokens]))
-                
-                if max_diff < 0.1:  # 10% tolerance for major tokens
-                    print(f"✅ {test_name}: Distributions are similar (max diff: {max_diff:.3f}, p-value: {p_value:.3f})")
-                    return True
-                else:
-                    print(f"⚠️  {test_name}: Large difference in major tokens (max diff: {max_diff:.3f})")
-                    return False
-            else:
-                print(f"✅ {test_name}: No major tokens to compare")
+            if max_diff < 0.1:  # 10% tolerance for major tokens
+                print(f"✅ {test_name}: Distributions are similar (max diff: {max_diff:.3f}, p-value: {p_value:.3f})")
                 return True
+            else:
+                print(f"⚠️  {test_name}: Large difference in major tokens (max diff: {max_diff:.3f})")
+                return False
         else:
-            print(f"❌ {test_name}: Empty distributions")
-            return False
+            print(f"✅ {test_name}: No major tokens to compare")
+            return True
     
     except Exception as e:
         print(f"❌ {test_name}: Statistical test failed: {e}")
@@ -2,9 +2,16 @@ import numpy as np
 import torch
 import json
 import random
+import sys
 
 # Import the sampling functions
-from sampling import nucleus_sampling, random_sampling, ras_sampling, sampling_ids
+from sampling import nucleus_sampling, random_sampling, ras_sampling, sampling_ids, batch_sampling_ids
+
+# The Numba port is optional, run_python_tests(use_numba=True) checks it instead of the torch version
+try:
+    import sampling_numba
+except ImportError:
+    sampling_numba = None
 
 def generate_test_cases():
     """Generate random test data for comparing Python and C++ implementations"""
@@ -87,10 +94,19 @@ def generate_test_cases():
     
     return test_cases
 
-def run_python_tests():
+def run_python_tests(use_numba=False):
     """Run tests with Python implementation and save results"""
     
+    if use_numba:
+        if sampling_numba is None:
+            raise RuntimeError("use_numba=True but numba is not installed")
+        sample_batch = sampling_numba.batch_sampling_ids
+        print("Using the Numba implementation (sampling_numba.py)")
+    else:
+        sample_batch = batch_sampling_ids
+    
     test_cases = generate_test_cases()
+    rng = np.random.default_rng(42)
     results = []
     
     for case in test_cases:
@@ -101,33 +117,25 @@ def run_python_tests():
         speech_token_size = case['speech_token_size']
         
         # Run multiple samples to get distribution
-        samples = []
-        for i in range(1000):
-            try:
-                sample_id = sampling_ids(
-                    weighted_scores=weighted_scores,
-                    decoded_tokens=decoded_tokens,
-                    speech_token_size=speech_token_size,
-                    sampling=0,  # Not used in current implementation
-                    ignore_eos=case['ignore_eos']
-                )
-                # Handle both tensor and scalar returns
-                if hasattr(sample_id, 'item'):
-                    samples.append(int(sample_id.item()))
-                elif hasattr(sample_id, '__iter__'):
-                    samples.append(int(sample_id[0]))
-                else:
-                    samples.append(int(sample_id))
-            except Exception as e:
-                print(f"Error in sample {i}: {e}")
-                break
+        try:
+            samples = sample_batch(
+                weighted_scores=weighted_scores,
+                decoded_tokens=decoded_tokens,
+                speech_token_size=speech_token_size,
+                sampling=0,  # Not used in current implementation
+                ignore_eos=case['ignore_eos'],
+                n=1000,
+                rng=rng
+            ).tolist()
+        except RuntimeError as e:
+            print(f"Error in sampling: {e}")
+            samples = []
         
         # Calculate distribution
         vocab_size = len(case['weighted_scores'])
-        distribution = [0] * vocab_size
-        for sample in samples:
-            if 0 <= sample < vocab_size:
-                distribution[sample] += 1
+        arr = np.asarray(samples, dtype=np.int64)
+        arr = arr[(arr >= 0) & (arr < vocab_size)]
+        distribution = np.bincount(arr, minlength=vocab_size).tolist()
         
         result = {
             "test_case": case['name'],
@@ -138,9 +146,9 @@ def run_python_tests():
         }
         results.append(result)
     
-    # Save results to file
+    # Save results to file, only read back by compare_results.py
     with open('python_results.json', 'w') as f:
-        json.dump(results, f, indent=2)
+        json.dump(results, f)
     
     # Also generate a C++ header file with test data for consistency
     generate_cpp_test_data(test_cases)
@@ -150,48 +158,50 @@ def run_python_tests():
 
 def generate_cpp_test_data(test_cases):
     """Generate a C++ header file with the exact same test data as Python"""
+    # Assemble the whole header in memory and write it with a single call
+    buf = [
+        "#pragma once\n",
+        "#include <vector>\n",
+        "#include <string>\n\n",
+        "struct TestCase {\n",
+        "    std::string name;\n",
+        "    std::vector<float> weighted_scores;\n",
+        "    std::vector<int> decoded_tokens;\n",
+        "    int speech_token_size;\n",
+        "    float top_p;\n",
+        "    int top_k;\n",
+        "    int win_size;\n",
+        "    float tau_r;\n",
+        "    bool ignore_eos;\n",
+        "};\n\n",
+        "std::vector<TestCase> get_test_cases() {\n",
+        "    return {\n",
+    ]
+    
+    for i, case in enumerate(test_cases):
+        weighted_scores = np.asarray(case["weighted_scores"], dtype=np.float32).tolist()
+        buf.append("        {\n")
+        buf.append(f'            "{case["name"]}",\n')
+        buf.append("            {" + ", ".join(map("{}f".format, weighted_scores)) + "},\n")
+        buf.append("            {" + ", ".join(map(str, case["decoded_tokens"])) + "},\n")
+        buf.append(f'            {case["speech_token_size"]},\n')
+        buf.append(f'            {case["top_p"]}f,\n')
+        buf.append(f'            {case["top_k"]},\n')
+        buf.append(f'            {case["win_size"]},\n')
+        buf.append(f'            {case["tau_r"]}f,\n')
+        buf.append(f'            {str(case["ignore_eos"]).lower()}\n')
+        buf.append("        }")
+        if i < len(test_cases) - 1:
+            buf.append(",")
+        buf.append("\n")
+    
+    buf.append("    };\n")
+    buf.append("}\n")
+    
     with open('test_data.hpp', 'w') as f:
-        f.write("#pragma once\n")
-        f.write("#include <vector>\n")
-        f.write("#include <string>\n\n")
-        f.write("struct TestCase {\n")
-        f.write("    std::string name;\n")
-        f.write("    std::vector<float> weighted_scores;\n")
-        f.write("    std::vector<int> decoded_tokens;\n")
-        f.write("    int speech_token_size;\n")
-        f.write("    float top_p;\n")
-        f.write("    int top_k;\n")
-        f.write("    int win_size;\n")
-        f.write("    float tau_r;\n")
-        f.write("    bool ignore_eos;\n")
-        f.write("};\n\n")
-        f.write("std::vector<TestCase> get_test_cases() {\n")
-        f.write("    return {\n")
-        
-        for i, case in enumerate(test_cases):
-            f.write("        {\n")
-            f.write(f'            "{case["name"]}",\n')
-            f.write("            {")
-            f.write(", ".join([f"{x}f" for x in case["weighted_scores"]]))
-            f.write("},\n")
-            f.write("            {")
-            f.write(", ".join([str(x) for x in case["decoded_tokens"]]))
-            f.write("},\n")
-            f.write(f'            {case["speech_token_size"]},\n')
-            f.write(f'            {case["top_p"]}f,\n')
-            f.write(f'            {case["top_k"]},\n')
-            f.write(f'            {case["win_size"]},\n')
-            f.write(f'            {case["tau_r"]}f,\n')
-            f.write(f'            {str(case["ignore_eos"]).lower()}\n')
-            f.write("        }")
-            if i < len(test_cases) - 1:
-                f.write(",")
-            f.write("\n")
-        
-        f.write("    };\n")
-        f.write("}\n")
+        f.write(''.join(buf))
     
     print("C++ test data header saved to test_data.hpp")
 
 if __name__ == "__main__":
-    run_python_tests()
\ No newline at end of file
+    run_python_tests(use_numba='--numba' in sys.argv[1:])
\ No newline at end of file
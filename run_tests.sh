@@ -31,4 +31,19 @@ fi
 echo "Step 3: Comparing results..."
 python compare_results.py
 
+# Step 4: Repeat the comparison with the Numba port when numba is installed
+if python -c "import numba" 2>/dev/null; then
+    echo "Step 4: Running Numba tests and comparing results..."
+    python generate_test_data.py --numba
+
+    if [ $? -ne 0 ]; then
+        echo "❌ Numba test failed"
+        exit 1
+    fi
+
+    python compare_results.py
+else
+    echo "Step 4: numba not installed, skipping the Numba comparison"
+fi
+
 echo "Test completed!"
\ No newline at end of file
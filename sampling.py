@@ -5,20 +5,18 @@ import torch
 from torch import nn
 from typing import Dict, Optional, Callable, List, Generator
 
+def prepare_nucleus(weighted_scores, top_p=0.8, top_k=25):
+    full_probs = weighted_scores.softmax(dim=0)
+    # only the top_k largest probabilities can be kept, no need to sort the rest
+    sorted_value, sorted_idx = full_probs.topk(min(top_k, full_probs.numel()))
+    # sampling both top-p and numbers.
+    cum_prob = torch.cumsum(sorted_value, dim=0)
+    k = int(torch.searchsorted(cum_prob, torch.tensor(top_p).to(cum_prob)).item()) + 1
+    k = min(k, cum_prob.numel())
+    return sorted_value[:k], sorted_idx[:k], full_probs
+
 def nucleus_sampling(weighted_scores, top_p=0.8, top_k=25):
-    prob, indices = [], []
-    cum_prob = 0.0
-    sorted_value, sorted_idx = weighted_scores.softmax(dim=0).sort(descending=True, stable=True)
-    for i in range(len(sorted_idx)):
-        # sampling both top-p and numbers.
-        if cum_prob < top_p and len(prob) < top_k:
-            cum_prob += sorted_value[i]
-            prob.append(sorted_value[i])
-            indices.append(sorted_idx[i])
-        else:
-            break
-    prob = torch.tensor(prob).to(weighted_scores)
-    indices = torch.tensor(indices, dtype=torch.long).to(weighted_scores.device)
+    prob, indices, _ = prepare_nucleus(weighted_scores, top_p=top_p, top_k=top_k)
     top_ids = indices[prob.multinomial(1, replacement=True)]
     return top_ids
 
@@ -26,11 +24,23 @@ def random_sampling(weighted_scores, decoded_tokens, sampling):
     top_ids = weighted_scores.softmax(dim=0).multinomial(1, replacement=True)
     return top_ids
 
-def ras_sampling(weighted_scores, decoded_tokens, sampling, top_p=0.8, top_k=25, win_size=10, tau_r=0.1):
-    top_ids = nucleus_sampling(weighted_scores, top_p=top_p, top_k=top_k)
-    rep_num = (torch.tensor(decoded_tokens[-win_size:]).to(weighted_scores.device) == top_ids).sum().item()
+def decoded_window(decoded_tokens, win_size):
+    # last win_size tokens as a list of ints, decoded_tokens may be a list, ndarray or tensor
+    tail = decoded_tokens[-win_size:]
+    return tail.tolist() if hasattr(tail, 'tolist') else list(tail)
+
+def ras_sampling(weighted_scores, decoded_tokens, sampling, top_p=0.8, top_k=25, win_size=10, tau_r=0.1, nucleus=None, decoded_tail=None):
+    # nucleus is the (trunc_probs, trunc_indices, full_probs) triple from prepare_nucleus,
+    # decoded_tail is the list from decoded_window(decoded_tokens, win_size)
+    if nucleus is None:
+        nucleus = prepare_nucleus(weighted_scores, top_p=top_p, top_k=top_k)
+    if decoded_tail is None:
+        decoded_tail = decoded_window(decoded_tokens, win_size)
+    prob, indices, full_probs = nucleus
+    top_ids = indices[prob.multinomial(1, replacement=True)]
+    rep_num = decoded_tail.count(int(top_ids.item()))
     if rep_num >= win_size * tau_r:
-        top_ids = random_sampling(weighted_scores, decoded_tokens, sampling)
+        top_ids = full_probs.multinomial(1, replacement=True)
     return top_ids
 
 def sampling_ids(
@@ -39,13 +49,58 @@ def sampling_ids(
         speech_token_size,
         sampling: int,
         ignore_eos: bool = True,
+        top_p=0.8, top_k=25, win_size=10, tau_r=0.1,
 ):
+    # loop invariants of ras_sampling, built from the same parameters it is called with
+    nucleus = prepare_nucleus(weighted_scores, top_p=top_p, top_k=top_k)
+    decoded_tail = decoded_window(decoded_tokens, win_size)
     num_trials, max_trials = 0, 100
     while True:
-        top_ids = ras_sampling(weighted_scores, decoded_tokens, sampling)
+        top_ids = ras_sampling(weighted_scores, decoded_tokens, sampling, top_p=top_p, top_k=top_k, win_size=win_size, tau_r=tau_r,
+                               nucleus=nucleus, decoded_tail=decoded_tail)
         if (not ignore_eos) or (speech_token_size not in top_ids):
             break
         num_trials += 1
         if num_trials > max_trials:
             raise RuntimeError('sampling reaches max_trials {} and still get eos when ignore_eos is True, check your input!'.format(max_trials))
     return top_ids
+
+
+def batch_sampling_ids(
+        weighted_scores: torch.Tensor,
+        decoded_tokens: List,
+        speech_token_size,
+        sampling: int,
+        ignore_eos: bool = True,
+        n: int = 1000,
+        top_p=0.8, top_k=25, win_size=10, tau_r=0.1,
+        rng: Optional[np.random.Generator] = None,
+):
+    # draws n independent sampling_ids results at once, softmax/sort are shared by all draws
+    # and the draws themselves are batched numpy rng calls
+    if weighted_scores.dim() != 1 or weighted_scores.numel() == 0:
+        raise ValueError('weighted_scores must be a non-empty 1-D tensor, got shape {}'.format(tuple(weighted_scores.shape)))
+    if rng is None:
+        rng = np.random.default_rng()
+    prob, indices, full_probs = (x.detach().cpu().numpy() for x in prepare_nucleus(weighted_scores, top_p=top_p, top_k=top_k))
+    prob = prob.astype(np.float64) / prob.sum(dtype=np.float64)
+    full_probs = full_probs.astype(np.float64) / full_probs.sum(dtype=np.float64)
+    tail = np.asarray(decoded_tokens[-win_size:], dtype=np.int64)
+
+    def draw(num):
+        # both candidates are drawn for every row and selected on the repetition check
+        nucleus_ids = rng.choice(indices, size=num, replace=True, p=prob)
+        random_ids = rng.choice(full_probs.size, size=num, replace=True, p=full_probs)
+        rep = (tail[None, :] == nucleus_ids[:, None]).sum(1) >= win_size * tau_r
+        return np.where(rep, random_ids, nucleus_ids)
+
+    top_ids = draw(n)
+    num_trials, max_trials = 0, 100
+    eos = top_ids == speech_token_size
+    while ignore_eos and eos.any():
+        num_trials += 1
+        if num_trials > max_trials:
+            raise RuntimeError('sampling reaches max_trials {} and still get eos when ignore_eos is True, check your input!'.format(max_trials))
+        top_ids[eos] = draw(int(eos.sum()))
+        eos = top_ids == speech_token_size
+    return top_ids
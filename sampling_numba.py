@@ -0,0 +1,113 @@
+import numpy as np
+import torch
+from numba import njit, prange
+from typing import List, Optional
+
+@njit(cache=True)
+def _ras_prepare(scores_np, top_p, top_k):
+    # softmax with max subtraction
+    probs = np.exp(scores_np - scores_np.max())
+    probs /= probs.sum()
+
+    # nucleus sampling, same top-p/top-k cutoff as sampling.nucleus_sampling
+    sorted_idx = np.argsort(-probs, kind='mergesort')
+    num = min(top_k, probs.size)
+    cum_prob = 0.0
+    k = 0
+    while k < num and cum_prob < top_p:
+        cum_prob += probs[sorted_idx[k]]
+        k += 1
+    nucleus_ids = sorted_idx[:k].copy()
+    nucleus_cdf = np.cumsum(probs[nucleus_ids])
+    full_cdf = np.cumsum(probs)
+    return nucleus_cdf, nucleus_ids, full_cdf
+
+def prepare_nucleus(scores_np, top_p=0.8, top_k=25):
+    # _ras_prepare with a guard, the jitted draws index the nucleus without bounds checks
+    prepared = _ras_prepare(scores_np, top_p, top_k)
+    if prepared[1].size == 0:
+        raise ValueError('nucleus sampling kept no tokens (top_p={}, top_k={}), top_k must be >= 1'.format(top_p, top_k))
+    return prepared
+
+@njit(cache=True)
+def _ras_core(nucleus_cdf, nucleus_ids, full_cdf, decoded_np, win_size, tau_r, u_nucleus, u_random):
+    # inverse-CDF draw from the renormalized truncated distribution
+    pos = min(np.searchsorted(nucleus_cdf, u_nucleus * nucleus_cdf[-1], side='right'), nucleus_ids.size - 1)
+    nucleus_id = nucleus_ids[pos]
+    # random sampling from the full softmax, drawn unconditionally
+    random_id = min(np.searchsorted(full_cdf, u_random * full_cdf[-1], side='right'), full_cdf.size - 1)
+
+    # repetition check over the last win_size decoded tokens
+    rep_num = 0
+    for i in range(max(0, decoded_np.size - win_size), decoded_np.size):
+        rep_num += decoded_np[i] == nucleus_id
+    # select without branching on the (unpredictable) repetition check
+    mask = np.int64(rep_num >= win_size * tau_r)
+    return random_id * mask + nucleus_id * (1 - mask)
+
+@njit(cache=True, parallel=True)
+def _ras_batch(nucleus_cdf, nucleus_ids, full_cdf, decoded_np, win_size, tau_r, u_nucleus, u_random):
+    # one independent _ras_core draw per pair of uniforms, spread over threads
+    samples = np.empty(u_nucleus.size, dtype=np.int64)
+    for i in prange(u_nucleus.size):
+        samples[i] = _ras_core(nucleus_cdf, nucleus_ids, full_cdf, decoded_np, win_size, tau_r, u_nucleus[i], u_random[i])
+    return samples
+
+def ras_sampling(scores_np, decoded_np, top_p=0.8, top_k=25, win_size=10, tau_r=0.1, prepared=None):
+    # prepared is the (nucleus_cdf, nucleus_ids, full_cdf) triple from prepare_nucleus
+    if prepared is None:
+        prepared = prepare_nucleus(scores_np, top_p, top_k)
+    u_nucleus, u_random = np.random.random(2)
+    return int(_ras_core(*prepared, decoded_np, win_size, tau_r, u_nucleus, u_random))
+
+def sampling_ids(
+        weighted_scores: torch.Tensor,
+        decoded_tokens: List,
+        speech_token_size,
+        sampling: int,
+        ignore_eos: bool = True,
+        top_p=0.8, top_k=25, win_size=10, tau_r=0.1,
+):
+    # numpy views and the nucleus/full CDFs are built once, every retry reuses them
+    scores_np = weighted_scores.detach().cpu().numpy().astype(np.float64)
+    decoded_np = np.asarray(decoded_tokens, dtype=np.int64)
+    prepared = prepare_nucleus(scores_np, top_p, top_k)
+    num_trials, max_trials = 0, 100
+    while True:
+        top_ids = ras_sampling(scores_np, decoded_np, top_p=top_p, top_k=top_k, win_size=win_size, tau_r=tau_r, prepared=prepared)
+        if (not ignore_eos) or (top_ids != speech_token_size):
+            break
+        num_trials += 1
+        if num_trials > max_trials:
+            raise RuntimeError('sampling reaches max_trials {} and still get eos when ignore_eos is True, check your input!'.format(max_trials))
+    return top_ids
+
+def batch_sampling_ids(
+        weighted_scores: torch.Tensor,
+        decoded_tokens: List,
+        speech_token_size,
+        sampling: int,
+        ignore_eos: bool = True,
+        n: int = 1000,
+        top_p=0.8, top_k=25, win_size=10, tau_r=0.1,
+        rng: Optional[np.random.Generator] = None,
+):
+    # n independent sampling_ids draws, prepared once and drawn in parallel by _ras_batch
+    if weighted_scores.dim() != 1 or weighted_scores.numel() == 0:
+        raise ValueError('weighted_scores must be a non-empty 1-D tensor, got shape {}'.format(tuple(weighted_scores.shape)))
+    if rng is None:
+        rng = np.random.default_rng()
+    scores_np = weighted_scores.detach().cpu().numpy().astype(np.float64)
+    decoded_np = np.asarray(decoded_tokens, dtype=np.int64)
+    nucleus_cdf, nucleus_ids, full_cdf = prepare_nucleus(scores_np, top_p, top_k)
+    top_ids = _ras_batch(nucleus_cdf, nucleus_ids, full_cdf, decoded_np, win_size, tau_r, rng.random(n), rng.random(n))
+    num_trials, max_trials = 0, 100
+    eos = top_ids == speech_token_size
+    while ignore_eos and eos.any():
+        num_trials += 1
+        if num_trials > max_trials:
+            raise RuntimeError('sampling reaches max_trials {} and still get eos when ignore_eos is True, check your input!'.format(max_trials))
+        num = int(eos.sum())
+        top_ids[eos] = _ras_batch(nucleus_cdf, nucleus_ids, full_cdf, decoded_np, win_size, tau_r, rng.random(num), rng.random(num))
+        eos = top_ids == speech_token_size
+    return top_ids